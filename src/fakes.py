@@ -4,9 +4,23 @@ Fake implementations of BlokusBase.
 We provide a BlokusStub implementation, and
 you must provide a BlokusFake implementation.
 """
+from typing import Optional
+
+import shape_definitions
 from shape_definitions import ShapeKind
-from piece import Point, Shape, Piece
-from base import BlokusBase, Grid
+from piece import Point, Shape, Piece, Bitboard, KINDS
+from piece import orientations, distinct_orientations
+from base import BlokusBase, Cell, Grid
+
+# A move can be represented compactly by the kind id (see KIND_IDS)
+# and orientation number (see orientations) of the piece, plus the
+# row and column of its anchor.
+#
+Move = tuple[int, int, int, int]
+
+# The bitmask of shapes played by a player who has played them all
+#
+ALL_PLAYED = (1 << len(KINDS)) - 1
 
 
 class BlokusStub(BlokusBase):
@@ -246,6 +260,441 @@ class BlokusStub(BlokusBase):
         return pieces
 
 
-#
-# Your BlokusFake implementation goes here
-#
+class BlokusFake(BlokusBase):
+    """
+    Fake implementation of BlokusBase.
+
+    This fake implementation behaves according to the following rules:
+
+    - It supports one to four players, all 21 Blokus shapes, and
+      boards of any size of at least 5.
+    - Pieces may be placed anywhere on the board, as long as they
+      do not collide with a wall or with any previously played
+      pieces. There is no consideration of start positions, nor of
+      the corner and edge rules between a player's pieces.
+    - The game ends when every player is either retired or has
+      played all their pieces.
+    - Scores do not include any bonuses for playing all pieces.
+    - `available_moves` returns every non-colliding placement of
+      the current player's remaining shapes, or none once the
+      game is over.
+
+    The occupied squares of the board are tracked as a bitboard
+    (see piece.py), so that collision checks are a single AND
+    rather than a loop over the squares of the piece. The player
+    and shape kind of each square, which are only needed for the
+    grid property, are stored separately in two flat bytearrays.
+    """
+
+    _shapes: dict[ShapeKind, Shape]
+    _shapes_by_id: tuple[Shape, ...]
+    _size: int
+    _num_players: int
+    _start_positions: set[Point]
+    _curr_player: int
+    _retired_players: set[int]
+    _active: int
+    _played: dict[int, int]
+    _unplayed_squares: dict[int, int]
+    _occupied: Bitboard
+    _owners: bytearray
+    _kinds: bytearray
+    _grid: Optional[Grid]
+
+    def __init__(
+        self,
+        num_players: int,
+        size: int,
+        start_positions: set[Point],
+    ) -> None:
+        """
+        Constructor (See BlokusBase)
+        """
+        if not 1 <= num_players <= 4:
+            raise ValueError(f"Invalid number of players: {num_players}")
+        if size < 5:
+            raise ValueError(f"Invalid board size: {size}")
+        if any(
+            not (0 <= r < size and 0 <= c < size) for r, c in start_positions
+        ):
+            raise ValueError("Start positions must be on the board")
+        if len(start_positions) < num_players:
+            raise ValueError("Not enough start positions")
+
+        super().__init__(num_players, size, start_positions)
+        self._shapes = self._load_shapes()
+        # The same shapes, indexed by kind id (see KINDS), so that
+        # moves can be looked up without hashing a ShapeKind
+        self._shapes_by_id = tuple(self._shapes[kind] for kind in KINDS)
+        self._curr_player = 1
+        self._retired_players = set()
+        # The number of players who still get turns (see _can_move)
+        self._active = num_players
+        # The shapes each player has played, as a bitmask with
+        # one bit per kind id (see KIND_IDS)
+        self._played = {p: 0 for p in range(1, num_players + 1)}
+
+        # The number of squares in the shapes each player has not
+        # played (89 at the start), so that scores are not recounted
+        total = sum(shape.num_squares for shape in self._shapes.values())
+        self._unplayed_squares = {p: total for p in range(1, num_players + 1)}
+        self._occupied = 0
+
+        # The square (r, c) is at index r * size + c. An owner of
+        # 0 means the square is unoccupied; kinds are KIND_IDS.
+        self._owners = bytearray(size * size)
+        self._kinds = bytearray(size * size)
+
+        # Built from the bytearrays by the grid property, if needed
+        self._grid = None
+
+    def _load_shapes(self) -> dict[ShapeKind, Shape]:
+        """
+        Returns all 21 kinds of shapes, as built from their
+        string representations in shape_definitions.py.
+
+        Each game gets its own Shapes, which can be flipped and
+        rotated without affecting other games. Parsing the string
+        representations is cached (see Shape.from_string), so
+        this is cheap.
+        """
+        return {
+            kind: Shape.from_string(kind, definition)
+            for kind, definition in shape_definitions.definitions.items()
+        }
+
+    @property
+    def shapes(self) -> dict[ShapeKind, Shape]:
+        """
+        See BlokusBase
+
+        The game looks up shapes by kind id (for packed moves)
+        in a tuple built from this dictionary when the game is
+        constructed, so no shapes should be added to or removed
+        from it afterwards.
+        """
+        return self._shapes
+
+    @property
+    def size(self) -> int:
+        """
+        See BlokusBase
+        """
+        return self._size
+
+    @property
+    def start_positions(self) -> set[Point]:
+        """
+        See BlokusBase
+        """
+        return set(self._start_positions)
+
+    @property
+    def num_players(self) -> int:
+        """
+        See BlokusBase
+        """
+        return self._num_players
+
+    @property
+    def curr_player(self) -> int:
+        """
+        See BlokusBase
+        """
+        return self._curr_player
+
+    @property
+    def retired_players(self) -> set[int]:
+        """
+        See BlokusBase
+        """
+        return set(self._retired_players)
+
+    @property
+    def grid(self) -> Grid:
+        """
+        See BlokusBase
+
+        The grid is built from the bytearrays the first time it
+        is needed, after which maybe_place updates just the
+        squares of each piece placed.
+        """
+        if self._grid is None:
+            size = self.size
+            self._grid = [
+                [self._cell(r * size + c) for c in range(size)]
+                for r in range(size)
+            ]
+        return self._grid
+
+    def _cell(self, i: int) -> Cell:
+        """
+        Returns the Cell for the square at index i of the
+        bytearrays.
+        """
+        if self._owners[i] == 0:
+            return None
+        return (self._owners[i], KINDS[self._kinds[i]])
+
+    @property
+    def game_over(self) -> bool:
+        """
+        See BlokusBase
+        """
+        return self._active == 0
+
+    @property
+    def winners(self) -> Optional[list[int]]:
+        """
+        See BlokusBase
+        """
+        if not self.game_over:
+            return None
+        scores = {p: self.get_score(p) for p in range(1, self.num_players + 1)}
+        high_score = max(scores.values())
+        return [p for p, score in scores.items() if score == high_score]
+
+    def _can_move(self, player: int) -> bool:
+        """
+        Returns whether the player is neither retired nor out
+        of pieces, i.e. whether they still get turns.
+        """
+        return (
+            player not in self._retired_players
+            and self._played[player] != ALL_PLAYED
+        )
+
+    def _next_turn(self) -> None:
+        """
+        Advances curr_player to the next player who still gets
+        turns. If there is no such player, the game is over and
+        curr_player is left unchanged.
+        """
+        for i in range(1, self.num_players + 1):
+            player = (self._curr_player + i - 1) % self.num_players + 1
+            if self._can_move(player):
+                self._curr_player = player
+                return
+
+    def _check_unplayed(self, shape: Shape) -> None:
+        """
+        Raises ValueError if the current player has already
+        played a piece with this shape.
+        """
+        if self._played[self.curr_player] & (1 << shape.kind_id):
+            raise ValueError(
+                f"Player {self.curr_player} already played {shape.kind}"
+            )
+
+    def _check_piece(self, piece: Piece) -> None:
+        """
+        Raises ValueError if the current player has already
+        played a piece with this shape, or if the anchor of the
+        piece is None.
+        """
+        self._check_unplayed(piece.shape)
+        if piece.anchor is None:
+            raise ValueError("Piece does not have anchor")
+
+    def remaining_shapes(self, player: int) -> list[ShapeKind]:
+        """
+        See BlokusBase
+        """
+        played = self._played[player]
+        return [
+            kind
+            for kind_id, kind in enumerate(KINDS)
+            if not played >> kind_id & 1
+        ]
+
+    def _wall_collision(self, shape: Shape, anchor: Point) -> bool:
+        """
+        Returns whether the (oriented) shape, at the given anchor,
+        would collide with a wall, by comparing its bounding box
+        to the size of the board.
+        """
+        r, c = anchor
+        return (
+            r + shape.min_r < 0
+            or r + shape.max_r >= self.size
+            or c + shape.min_c < 0
+            or c + shape.max_c >= self.size
+        )
+
+    def any_wall_collisions(self, piece: Piece) -> bool:
+        """
+        See BlokusBase
+        """
+        self._check_piece(piece)
+        assert piece.anchor is not None
+        return self._wall_collision(piece.shape, piece.anchor)
+
+    def any_collisions(self, piece: Piece) -> bool:
+        """
+        See BlokusBase
+        """
+        self._check_piece(piece)
+        assert piece.anchor is not None
+        return self._wall_collision(piece.shape, piece.anchor) or bool(
+            self._occupied & piece.occupancy(self.size)
+        )
+
+    def legal_to_place(self, piece: Piece) -> bool:
+        """
+        See BlokusBase
+
+        The fake only requires that the piece does not collide
+        with a wall or any previously played pieces.
+        """
+        return not self.any_collisions(piece)
+
+    def maybe_place(self, piece: Piece) -> bool:
+        """
+        See BlokusBase
+
+        Performs the same checks as legal_to_place, but checks
+        the piece and computes its occupancy just once, for
+        both checking collisions and placing the piece. No
+        pieces can be placed once the game is over.
+        """
+        self._check_piece(piece)
+        assert piece.anchor is not None
+        if self.game_over:
+            return False
+        if self._wall_collision(piece.shape, piece.anchor):
+            return False
+        occupancy = piece.occupancy(self.size)
+        if self._occupied & occupancy:
+            return False
+
+        self._place(piece.shape, piece.abs_coords(), occupancy)
+        return True
+
+    def maybe_place_move(self, move: Move) -> bool:
+        """
+        Same as maybe_place, but for a move as represented by
+        available_moves_packed, without constructing a Piece.
+
+        Raises ValueError if the player has already
+        played a piece with this shape.
+        """
+        kind_id, orientation, r, c = move
+        shape = orientations(self._shapes_by_id[kind_id])[orientation]
+        self._check_unplayed(shape)
+        if self.game_over:
+            return False
+        if self._wall_collision(shape, (r, c)):
+            return False
+        occupancy = shape.occupancy_at(r, c, self._size)
+        if self._occupied & occupancy:
+            return False
+
+        self._place(shape, shape.coords_at(r, c), occupancy)
+        return True
+
+    def play_moves(self, moves: list[Optional[Move]]) -> None:
+        """
+        Plays a sequence of moves (see maybe_place_move), where
+        None indicates that the current player retires. Moves
+        that cannot be placed are skipped.
+        """
+        for move in moves:
+            if move is None:
+                self.retire()
+            else:
+                self.maybe_place_move(move)
+
+    def _place(
+        self,
+        shape: Shape,
+        coords: tuple[tuple[int, ...], tuple[int, ...]],
+        occupancy: Bitboard,
+    ) -> None:
+        """
+        Places the (oriented) shape for the current player,
+        given the rows and columns of its squares (as from
+        Piece.abs_coords) and its occupancy bitboard, and then
+        advances to the next turn.
+        """
+        player, kind_id = self.curr_player, shape.kind_id
+        cell = (player, shape.kind)
+        for r, c in zip(*coords):
+            i = r * self._size + c
+            self._owners[i] = player
+            self._kinds[i] = kind_id
+            if self._grid is not None:
+                self._grid[r][c] = cell
+        self._occupied |= occupancy
+        self._played[player] |= 1 << kind_id
+        if self._played[player] == ALL_PLAYED:
+            self._active -= 1
+        self._unplayed_squares[player] -= shape.num_squares
+        self._next_turn()
+
+    def retire(self) -> None:
+        """
+        See BlokusBase
+
+        Once the game is over, the current player is already
+        retired or out of pieces, so retiring has no effect.
+        """
+        if not self._can_move(self.curr_player):
+            return
+        self._active -= 1
+        self._retired_players.add(self.curr_player)
+        self._next_turn()
+
+    def get_score(self, player: int) -> int:
+        """
+        See BlokusBase
+        """
+        return -self._unplayed_squares[player]
+
+    def available_moves(self) -> set[Piece]:
+        """
+        See BlokusBase
+        """
+        moves = self.available_moves_packed()
+        return {self.move_to_piece(move) for move in moves}
+
+    def available_moves_packed(self) -> list[Move]:
+        """
+        Returns the same moves as available_moves, but as Move
+        tuples rather than Pieces, which avoids allocating and
+        hashing a Piece for every move (see move_to_piece).
+
+        Rather than checking every (shape, orientation, anchor)
+        with legal_to_place, each distinct orientation (see
+        distinct_orientations) is only tried at the anchors where
+        it fits within the walls, so each trial is a single shift
+        and AND of bitboards.
+
+        There are no available moves once the game is over.
+        """
+        if self.game_over:
+            return []
+        moves = []
+        size = self.size
+        played = self._played[self.curr_player]
+        for kind_id, shape in enumerate(self._shapes_by_id):
+            if played >> kind_id & 1:
+                continue
+            for orientation, oriented in distinct_orientations(shape):
+                bitmask, offset = oriented.mask(size)
+                for r in range(-oriented.min_r, size - oriented.max_r):
+                    row_offset = r * size + offset
+                    for c in range(-oriented.min_c, size - oriented.max_c):
+                        if self._occupied & (bitmask << (row_offset + c)):
+                            continue
+                        moves.append((kind_id, orientation, r, c))
+        return moves
+
+    def move_to_piece(self, move: Move) -> Piece:
+        """
+        Returns the Piece for a move from available_moves_packed.
+        """
+        kind_id, orientation, r, c = move
+        face_up, rotation = orientation < 4, orientation % 4
+        piece = Piece(self._shapes_by_id[kind_id], face_up, rotation)
+        piece.set_anchor((r, c))
+        return piece
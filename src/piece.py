@@ -1,12 +1,15 @@
 """
 Blokus shapes and pieces.
 
-Modify only the methods marked as TODO.
+Shapes are built from their string representations in
+shape_definitions.py, and Pieces place them on the board in one
+of eight precomputed orientations (see orientations).
 """
-import copy
+import textwrap
+from functools import lru_cache
 from typing import Optional
 
-from shape_definitions import ShapeKind
+from shape_definitions import ShapeKind, definitions
 
 # A point is represented by row and column numbers (r, c). The
 # top-left corner of a grid is (0, 0). Note that rows/columns
@@ -28,6 +31,56 @@ def col(point: Point) -> int:
     return point[1]
 
 
+# Shape kinds can also be identified by small ints, for example
+# to store them compactly in a bytearray: KINDS[KIND_IDS[kind]]
+# is kind.
+#
+KINDS: list[ShapeKind] = list(ShapeKind)
+KIND_IDS: dict[ShapeKind, int] = {kind: i for i, kind in enumerate(KINDS)}
+
+
+# A set of squares on a (size x size) board can also be represented
+# as a bitboard: a single int in which square (r, c) corresponds to
+# bit r * size + c. Unions, intersections, and translations of sets
+# of squares then become |, &, and << on ints, rather than loops
+# over lists and sets of points.
+#
+Bitboard = int
+
+
+@lru_cache(maxsize=None)
+def _parse(definition: str) -> tuple[Point, bool, tuple[Point, ...]]:
+    """
+    Parses the string representation of a shape (see
+    Shape.from_string) into its origin, whether or not it
+    can be transformed, and its squares.
+    """
+    # The first line of each definition is empty
+    lines = textwrap.dedent(definition).split("\n")[1:]
+
+    # Find the origin and the squares in a single scan
+    origin: Optional[Point] = None
+    points = []
+    for r, line in enumerate(lines):
+        for c, char in enumerate(line):
+            if char == "X":
+                points.append((r, c))
+            elif char == "O":
+                origin = (r, c)
+                points.append((r, c))
+            elif char == "@":
+                origin = (r, c)
+
+    can_be_transformed = origin is not None
+    if origin is None:
+        origin = (0, 0)
+
+    origin_r, origin_c = origin
+    squares = tuple((r - origin_r, c - origin_c) for r, c in points)
+
+    return origin, can_be_transformed, squares
+
+
 class Shape:
     """
     Representing the 21 Blokus shapes, as named and defined by
@@ -54,12 +107,48 @@ class Shape:
     string representation. But don't refer to this attribute
     elsewhere in your implementation; the information should not
     be necessary.
+
+    A Shape can be frozen (see freeze), after which flipping or
+    rotating it in place raises ValueError. The oriented shapes
+    used by Pieces are frozen because they are shared (see
+    orientations).
     """
 
+    __slots__ = (
+        "kind",
+        "kind_id",
+        "origin",
+        "can_be_transformed",
+        "squares",
+        "num_squares",
+        "rows",
+        "cols",
+        "min_r",
+        "max_r",
+        "min_c",
+        "max_c",
+        "cardinal",
+        "intercardinal",
+        "_masks",
+        "_frozen",
+    )
+
     kind: ShapeKind
+    kind_id: int
     origin: Point
     can_be_transformed: bool
     squares: list[Point]
+    num_squares: int
+    rows: tuple[int, ...]
+    cols: tuple[int, ...]
+    min_r: int
+    max_r: int
+    min_c: int
+    max_c: int
+    cardinal: frozenset[Point]
+    intercardinal: frozenset[Point]
+    _masks: dict[int, tuple[Bitboard, int]]
+    _frozen: bool
 
     def __init__(
         self,
@@ -72,9 +161,45 @@ class Shape:
         Constructor
         """
         self.kind = kind
+        self.kind_id = KIND_IDS[kind]
         self.origin = origin
         self.can_be_transformed = can_be_transformed
         self.squares = squares
+        self._reindex()
+
+        # See freeze
+        self._frozen = False
+
+    def _reindex(self) -> None:
+        """
+        Stores the number of squares, the rows and columns of
+        the squares as two parallel tuples, their bounding box,
+        and the cardinal and intercardinal neighbors of the
+        squares (relative to the origin), and discards any
+        cached bitmasks. The bounding box of a shape without
+        any squares is just the origin.
+        """
+        self.num_squares = len(self.squares)
+        self.rows = tuple(r for r, _ in self.squares)
+        self.cols = tuple(c for _, c in self.squares)
+        self.min_r = min(self.rows, default=0)
+        self.max_r = max(self.rows, default=0)
+        self.min_c = min(self.cols, default=0)
+        self.max_c = max(self.cols, default=0)
+
+        squares = set(self.squares)
+        self.cardinal = frozenset(
+            (r + dr, c + dc)
+            for r, c in squares
+            for dr, dc in [(-1, 0), (1, 0), (0, 1), (0, -1)]
+        ).difference(squares)
+        self.intercardinal = frozenset(
+            (r + dr, c + dc)
+            for r, c in squares
+            for dr, dc in [(-1, 1), (1, 1), (1, -1), (-1, -1)]
+        ).difference(squares, self.cardinal)
+
+        self._masks = {}
 
     def __str__(self) -> str:
         """
@@ -86,42 +211,205 @@ class Shape:
                 kind = {self.kind}
                 origin = {self.origin}
                 can_be_transformed = {self.can_be_transformed}
-                squares = {list(map(str, self.squares))}
+                squares = {self.squares}
+        """
+
+    def __repr__(self) -> str:
         """
+        Returns a short string representation of the shape.
+        """
+        return f"Shape({self.kind}, {self.squares})"
 
     @staticmethod
     def from_string(kind: ShapeKind, definition: str) -> "Shape":
         """
         Create a Shape based on its string representation
         in shape_definitions.py. See that file for details.
+
+        Shapes are mutable, so each call returns a new Shape,
+        but the string representation is only parsed once.
         """
-        # TODO
-        raise NotImplementedError
+        origin, can_be_transformed, squares = _parse(definition)
+        return Shape(kind, origin, can_be_transformed, list(squares))
+
+    def freeze(self) -> None:
+        """
+        Prevents the shape from being flipped or rotated in
+        place, so that it can be safely shared by all of the
+        Pieces with a given orientation. The squares of a
+        frozen shape must not be modified directly either.
+        """
+        self._frozen = True
+
+    def _transform(self, squares: list[Point]) -> None:
+        """
+        Replaces the squares (in row-major order) after a
+        flip or rotation.
+
+        Raises ValueError if the shape has been frozen.
+        """
+        if self._frozen:
+            raise ValueError(f"Cannot transform shared shape: {self!r}")
+        self.squares[:] = sorted(squares)
+        self._reindex()
 
     def flip_horizontally(self) -> None:
         """
         Flip the shape horizontally
         (across the vertical axis through its origin),
         by modifying the squares in place.
+
+        Raises ValueError if the shape has been frozen.
         """
-        # TODO
-        raise NotImplementedError
+        if self.can_be_transformed:
+            self._transform(list(zip(self.rows, [-c for c in self.cols])))
 
     def rotate_left(self) -> None:
         """
         Rotate the shape left by 90 degrees,
         by modifying the squares in place.
+
+        Raises ValueError if the shape has been frozen.
         """
-        # TODO
-        raise NotImplementedError
+        if self.can_be_transformed:
+            self._transform(list(zip([-c for c in self.cols], self.rows)))
 
     def rotate_right(self) -> None:
         """
         Rotate the shape right by 90 degrees,
         by modifying the squares in place.
+
+        Raises ValueError if the shape has been frozen.
+        """
+        if self.can_be_transformed:
+            self._transform(list(zip(self.cols, [-r for r in self.rows])))
+
+    def mask(self, size: int) -> tuple[Bitboard, int]:
+        """
+        Returns the squares as a bitboard for a (size x size)
+        board, translated so that the top-left corner of the
+        bounding box is at (0, 0), along with the (possibly
+        negative) offset of that corner relative to the origin.
+        Shifting the bitboard left by anchor_bit + offset places
+        the shape at a given anchor. Computed once per board size.
         """
-        # TODO
-        raise NotImplementedError
+        if size not in self._masks:
+            bitmask = 0
+            for r, c in zip(self.rows, self.cols):
+                bitmask |= 1 << ((r - self.min_r) * size + (c - self.min_c))
+            self._masks[size] = (bitmask, self.min_r * size + self.min_c)
+        return self._masks[size]
+
+    def occupancy_at(self, r: int, c: int, size: int) -> Bitboard:
+        """
+        Returns the squares as a bitboard for a (size x size)
+        board, with the origin at (r, c) (see mask). The shape
+        must not collide with any walls of the board.
+        """
+        bitmask, offset = self.mask(size)
+        return bitmask << (r * size + c + offset)
+
+    def coords_at(
+        self, r: int, c: int
+    ) -> tuple[tuple[int, ...], tuple[int, ...]]:
+        """
+        Returns the rows and columns of the squares, with the
+        origin at (r, c), as two parallel tuples (see rows and
+        cols).
+        """
+        return (
+            tuple(r + dr for dr in self.rows),
+            tuple(c + dc for dc in self.cols),
+        )
+
+
+# The eight orientations of a shape are numbered from 0 to 7:
+# a shape that is flipped (not face up) and then right-rotated
+# (modulo 4) times has orientation 4 * flipped + rotation.
+#
+# The orientations of each distinct shape are computed just once,
+# and then shared by all of the Pieces with that shape. Orientations
+# with the same kind and squares (for example, all eight orientations
+# of the "1" and "X" shapes, or orientation 1 of "Z" and orientation 0
+# of a "Z" that was rotated right) share a single Shape object. These
+# shared Shapes cannot be flipped or rotated in place.
+#
+Orientations = tuple[Shape, ...]
+
+_ShapeKey = tuple[ShapeKind, bool, tuple[Point, ...]]
+
+_orientations: dict[_ShapeKey, Orientations] = {}
+_oriented: dict[tuple[ShapeKind, tuple[Point, ...]], Shape] = {}
+_distinct_orientations: dict[_ShapeKey, list[tuple[int, Shape]]] = {}
+
+
+def _key(shape: Shape) -> _ShapeKey:
+    """
+    Returns the key under which the orientations of the
+    shape are cached.
+    """
+    return (shape.kind, shape.can_be_transformed, tuple(shape.squares))
+
+
+def orientations(shape: Shape) -> Orientations:
+    """
+    Returns the eight orientations of the given shape,
+    indexed by orientation number (see above).
+    """
+    key = _key(shape)
+    if key not in _orientations:
+        table = []
+        for flipped in [False, True]:
+            for rotation in range(4):
+                # The points are immutable tuples, so copying the
+                # list of squares is enough
+                oriented = Shape(
+                    shape.kind,
+                    shape.origin,
+                    shape.can_be_transformed,
+                    shape.squares[:],
+                )
+                if flipped:
+                    oriented.flip_horizontally()
+                for _ in range(rotation):
+                    oriented.rotate_right()
+                oriented.freeze()
+                squares = tuple(sorted(oriented.squares))
+                table.append(
+                    _oriented.setdefault((shape.kind, squares), oriented)
+                )
+        _orientations[key] = tuple(table)
+
+        # Orientations that are translations of one another
+        # (such as the two horizontal orientations of "4")
+        # cover the same sets of squares at different anchors
+        translations: dict[frozenset[Point], tuple[int, Shape]] = {}
+        for orientation, oriented in enumerate(table):
+            normalized = frozenset(
+                (r - oriented.min_r, c - oriented.min_c)
+                for r, c in oriented.squares
+            )
+            translations.setdefault(normalized, (orientation, oriented))
+        _distinct_orientations[key] = list(translations.values())
+    return _orientations[key]
+
+
+def distinct_orientations(shape: Shape) -> list[tuple[int, Shape]]:
+    """
+    Returns one (orientation number, oriented shape) pair for
+    each orientation of the given shape whose squares are not
+    just a translation of those of an earlier orientation.
+    Trying each of these at every anchor covers every possible
+    placement of the shape exactly once. For example, "X" has
+    one distinct orientation, "4" has two, and "F" has eight.
+    """
+    orientations(shape)
+    return _distinct_orientations[_key(shape)]
+
+
+# Compute the orientations of the 21 shapes once, at import time
+for _kind, _definition in definitions.items():
+    orientations(Shape.from_string(_kind, _definition))
 
 
 class Piece:
@@ -130,48 +418,102 @@ class Piece:
 
     The anchor point is used to locate the Shape.
 
-    For flips and rotations, rather than storing these
-    orientations directly (for example, using two attributes
-    called face_up: bool and rotation: int), we modify
-    the shape attribute in place. Therefore, it is important
-    that each Piece object has its own deep copy of a
-    Shape, so that transforming one Piece does not affect
-    other Pieces that have the same Shape.
+    Rather than transforming a copy of the Shape for every
+    Piece, each Piece refers to one of the eight precomputed
+    orientations of its Shape (see orientations), and flips
+    and rotations simply select a different orientation. The
+    shape property is shared by all Pieces with the same
+    Shape and orientation, and cannot be modified in place.
     """
 
-    shape: Shape
+    __slots__ = (
+        "anchor",
+        "_orientations",
+        "_orientation",
+        "_hash",
+        "_coords",
+        "_occupancy",
+    )
+
     anchor: Optional[Point]
+    _orientations: Orientations
+    _orientation: int
+    _hash: Optional[int]
+    _coords: Optional[tuple[tuple[int, ...], tuple[int, ...]]]
+    _occupancy: Optional[tuple[int, Bitboard]]
 
     def __init__(self, shape: Shape, face_up: bool = True, rotation: int = 0):
         """
-        Each Piece will get its own deep copy of the given shape
-        subject to initial transformations according to the arguments:
+        Each Piece will refer to an orientation of the given shape
+        according to the arguments:
 
-            face_up:  If true, the initial Shape will be flipped
+            face_up:  If false, the initial Shape will be flipped
                       horizontally.
             rotation: This number, modulo 4, indicates how many
                       times the shape should be right-rotated by
-                      90 degrees.
+                      90 degrees (after flipping).
         """
-        # Deep copy shape, so that it can be transformed in place
-        self.shape = copy.deepcopy(shape)
+        self._orientations = orientations(shape)
+        self._orient(4 * (not face_up) + rotation % 4)
 
         # The anchor will be set by set_anchor
         self.anchor = None
 
-        # We choose to flip...
-        if not face_up:
-            self.shape.flip_horizontally()
+    @property
+    def shape(self) -> Shape:
+        """
+        Returns the (shared) Shape in the current orientation.
+        """
+        return self._orientations[self._orientation]
+
+    def _orient(self, orientation: int) -> None:
+        """
+        Sets the orientation (and, therefore, the shape)
+        of the piece.
+        """
+        self._orientation = orientation
+        self._moved()
+
+    def _moved(self) -> None:
+        """
+        Discards the cached hash, coordinates, and bitboard
+        after the piece has been moved, flipped, or rotated.
+        """
+        self._hash = None
+        self._coords = None
+        self._occupancy = None
+
+    def __eq__(self, other: object) -> bool:
+        """
+        Two pieces are equal if they have the same oriented
+        shape and anchor. Orientations with the same kind and
+        squares share a Shape object (see orientations), so,
+        for example, all orientations of a "1" piece at the
+        same anchor are equal, as are pieces built from
+        separately transformed copies of a shape that end up
+        covering the same squares.
+        """
+        if not isinstance(other, Piece):
+            return NotImplemented
+        return self.shape is other.shape and self.anchor == other.anchor
 
-        # ... before rotating
-        for _ in range(rotation % 4):
-            self.shape.rotate_right()
+    def __hash__(self) -> int:
+        """
+        Hashes the (shared) oriented shape and the anchor,
+        without looking at the squares. The hash is cached
+        until the piece is moved, flipped, or rotated.
+        """
+        if self._hash is None:
+            self._hash = hash((id(self.shape), self.anchor))
+        return self._hash
 
     def set_anchor(self, anchor: Point) -> None:
         """
         Set the anchor point.
         """
-        self.anchor = anchor
+        if anchor != self.anchor:
+            self.anchor = anchor
+            self._moved()
 
     def _check_anchor(self) -> None:
         """
@@ -180,30 +522,33 @@ class Piece:
         so each of those may raise ValueError.
         """
         if self.anchor is None:
-            raise ValueError(f"Piece does not have anchor: {self.shape}")
+            raise ValueError("Piece does not have anchor")
 
     def flip_horizontally(self) -> None:
         """
         Flip the piece horizontally.
         """
         self._check_anchor()
-        self.shape.flip_horizontally()
+        # Flipping after rotating is the same as rotating
+        # in the opposite direction after flipping
+        flipped, rotation = divmod(self._orientation, 4)
+        self._orient(4 * (not flipped) + -rotation % 4)
 
     def rotate_left(self) -> None:
         """
-        Rotate the shape left by 90 degrees,
-        by modifying the squares in place.
+        Rotate the piece left by 90 degrees.
         """
         self._check_anchor()
-        self.shape.rotate_left()
+        flipped, rotation = divmod(self._orientation, 4)
+        self._orient(4 * flipped + (rotation - 1) % 4)
 
     def rotate_right(self) -> None:
         """
-        Rotate the shape right by 90 degrees,
-        by modifying the squares in place.
+        Rotate the piece right by 90 degrees.
         """
         self._check_anchor()
-        self.shape.rotate_right()
+        flipped, rotation = divmod(self._orientation, 4)
+        self._orient(4 * flipped + (rotation + 1) % 4)
 
     def squares(self) -> list[Point]:
         """
@@ -212,12 +557,23 @@ class Piece:
 
         Raises ValueError if anchor is not set.
         """
-        self._check_anchor()
-        assert self.anchor is not None
-        return [
-            (row(self.anchor) + r, col(self.anchor) + c)
-            for r, c in self.shape.squares
-        ]
+        return list(zip(*self.abs_coords()))
+
+    def abs_coords(self) -> tuple[tuple[int, ...], tuple[int, ...]]:
+        """
+        Returns the rows and columns of the piece's squares (in
+        its current position and orientation) as two parallel
+        tuples, which is the layout of Shape.rows and Shape.cols.
+        The coordinates are cached until the piece is moved,
+        flipped, or rotated.
+
+        Raises ValueError if anchor is not set.
+        """
+        if self._coords is None:
+            self._check_anchor()
+            assert self.anchor is not None
+            self._coords = self.shape.coords_at(*self.anchor)
+        return self._coords
 
     def cardinal_neighbors(self) -> set[Point]:
         """
@@ -227,16 +583,47 @@ class Piece:
 
         Raises ValueError if anchor is not set.
         """
-        # TODO
-        raise NotImplementedError
+        return self._translate(self.shape.cardinal)
 
     def intercardinal_neighbors(self) -> set[Point]:
         """
         Returns the combined intercardinal neighbors
         (northeast, southeast, southwest, and northwest)
         corresponding to all of the piece's squares.
+        Squares that are also cardinal neighbors are not
+        included.
+
+        Raises ValueError if anchor is not set.
+        """
+        return self._translate(self.shape.intercardinal)
+
+    def _translate(self, points: frozenset[Point]) -> set[Point]:
+        """
+        Translates points relative to the origin of the shape
+        to the current position of the piece.
+
+        Raises ValueError if anchor is not set.
+        """
+        self._check_anchor()
+        assert self.anchor is not None
+        anchor_r, anchor_c = self.anchor
+        return {(anchor_r + r, anchor_c + c) for r, c in points}
+
+    def occupancy(self, size: int) -> Bitboard:
+        """
+        Returns the piece's squares as a bitboard for a
+        (size x size) board. The piece must not collide with
+        any walls of the board (the bits of squares beyond
+        the left or right walls would wrap into adjacent rows).
+
+        The bitboard (for the most recent board size) is cached
+        until the piece is moved, flipped, or rotated.
 
         Raises ValueError if anchor is not set.
         """
-        # TODO
-        raise NotImplementedError
+        if self._occupancy is None or self._occupancy[0] != size:
+            self._check_anchor()
+            assert self.anchor is not None
+            r, c = self.anchor
+            self._occupancy = (size, self.shape.occupancy_at(r, c, size))
+        return self._occupancy[1]
@@ -5,7 +5,7 @@ import shape_definitions
 from shape_definitions import ShapeKind
 from piece import Shape, Piece
 from base import BlokusBase
-from fakes import BlokusFake
+from fakes import BlokusFake, Move
 
 
 def test_inheritance() -> None:
@@ -75,6 +75,31 @@ def test_some_shapes_loaded() -> None:
     assert shape.squares == [(-1, 1), (0, 1), (1, -1), (1, 0), (1, 1)]
 
 
+def test_shapes_per_game() -> None:
+    """
+    Test that each game has its own shapes, which can be flipped
+    and rotated without affecting other games
+    """
+    blokus = BlokusFake(1, 5, {(0, 0)})
+    other = BlokusFake(1, 5, {(0, 0)})
+
+    shape = blokus.shapes[ShapeKind.Z]
+    assert shape is not other.shapes[ShapeKind.Z]
+    squares = shape.squares[:]
+    shape.rotate_right()
+    assert shape.squares != squares
+    assert other.shapes[ShapeKind.Z].squares == squares
+
+    # Pieces and packed moves use the rotated shape
+    piece = Piece(shape)
+    piece.set_anchor((2, 2))
+    move = blokus.move_to_piece((shape.kind_id, 0, 2, 2))
+    assert move == piece
+    assert move.squares() == [(1, 3), (2, 1), (2, 2), (2, 3), (3, 1)]
+    assert blokus.maybe_place_move((shape.kind_id, 0, 2, 2))
+    assert blokus.grid[2][1] == (1, ShapeKind.Z)
+
+
 def test_shape_five_from_string() -> None:
     """Test that shapes can be loaded using Shape.from_string"""
 
@@ -128,6 +153,63 @@ def test_shape_u_from_string() -> None:
     assert shape.squares == [(-1, 0), (-1, 1), (0, 0), (1, 0), (1, 1)]
 
 
+def test_shape_transformations() -> None:
+    """Test flipping and rotating shapes in place"""
+
+    definitions = shape_definitions.definitions
+
+    shape = Shape.from_string(ShapeKind.L, definitions[ShapeKind.L])
+    assert shape.squares == [(-2, 0), (-1, 0), (0, 0), (1, 0), (1, 1)]
+    shape.flip_horizontally()
+    assert shape.squares == [(-2, 0), (-1, 0), (0, 0), (1, -1), (1, 0)]
+    shape.flip_horizontally()
+    assert shape.squares == [(-2, 0), (-1, 0), (0, 0), (1, 0), (1, 1)]
+    shape.rotate_right()
+    assert shape.squares == [(0, -1), (0, 0), (0, 1), (0, 2), (1, -1)]
+    shape.rotate_left()
+    shape.rotate_left()
+    assert shape.squares == [(-1, 1), (0, -2), (0, -1), (0, 0), (0, 1)]
+    shape.rotate_right()
+    assert shape.squares == [(-2, 0), (-1, 0), (0, 0), (1, 0), (1, 1)]
+
+    # The origin of V, marked with '@', is not one of its squares
+    shape = Shape.from_string(ShapeKind.V, definitions[ShapeKind.V])
+    shape.flip_horizontally()
+    assert shape.squares == [(-1, -1), (0, -1), (1, -1), (1, 0), (1, 1)]
+    shape.flip_horizontally()
+    shape.rotate_left()
+    assert shape.squares == [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1)]
+    shape.rotate_right()
+    shape.rotate_right()
+    assert shape.squares == [(-1, -1), (0, -1), (1, -1), (1, 0), (1, 1)]
+
+    # Shapes without an explicit origin cannot be transformed
+    for kind in [ShapeKind.ONE, ShapeKind.LETTER_O]:
+        shape = Shape.from_string(kind, definitions[kind])
+        squares = shape.squares[:]
+        shape.flip_horizontally()
+        assert shape.squares == squares
+        shape.rotate_left()
+        assert shape.squares == squares
+        shape.rotate_right()
+        assert shape.squares == squares
+
+
+def test_shape_no_squares() -> None:
+    """Test that a shape can be constructed without any squares"""
+
+    shape = Shape(ShapeKind.ONE, (0, 0), True, [])
+    assert shape.squares == []
+    assert shape.num_squares == 0
+    shape.rotate_right()
+    assert shape.squares == []
+
+    piece = Piece(shape)
+    piece.set_anchor((2, 2))
+    assert piece.squares() == []
+    assert piece.occupancy(5) == 0
+
+
 def test_wall_collisions() -> None:
     """Test wall collisions with a handful of pieces and empty board"""
 
@@ -297,6 +379,63 @@ def test_retirement_2() -> None:
     assert blokus.get_score(2) == -83
 
 
+def test_retirement_after_game_over() -> None:
+    """
+    Test that the game ends exactly when the last player still
+    getting turns retires or plays their last piece, and that
+    retiring after that has no effect
+    """
+
+    # Both players play all their pieces
+    blokus = BlokusFake(2, 30, {(0, 0), (29, 29)})
+    for i in range(42):
+        assert not blokus.game_over
+        assert blokus.curr_player == i % 2 + 1
+        assert blokus.maybe_place_move(min(blokus.available_moves_packed()))
+    assert blokus.game_over
+    assert blokus.winners == [1, 2]
+
+    curr_player = blokus.curr_player
+    blokus.retire()
+    assert blokus.game_over
+    assert blokus.retired_players == set()
+    assert blokus.curr_player == curr_player
+
+    # Player 1 retires and Player 2 plays all their pieces
+    blokus = BlokusFake(2, 30, {(0, 0), (29, 29)})
+    blokus.retire()
+    for _ in range(21):
+        assert not blokus.game_over
+        assert blokus.curr_player == 2
+        assert blokus.maybe_place_move(min(blokus.available_moves_packed()))
+    assert blokus.game_over
+    assert blokus.winners == [2]
+
+    blokus.retire()
+    assert blokus.game_over
+    assert blokus.retired_players == {1}
+
+    # Both players retire, and retiring again has no effect
+    blokus = BlokusFake(2, 30, {(0, 0), (29, 29)})
+    blokus.retire()
+    assert not blokus.game_over
+    blokus.retire()
+    assert blokus.game_over
+    blokus.retire()
+    assert blokus.game_over
+    assert blokus.retired_players == {1, 2}
+
+    # Once the game is over, no more pieces can be placed
+    assert blokus.available_moves() == set()
+    assert blokus.available_moves_packed() == []
+    piece = Piece(blokus.shapes[ShapeKind.FIVE])
+    piece.set_anchor((5, 5))
+    assert not blokus.maybe_place(piece)
+    assert not blokus.maybe_place_move((piece.shape.kind_id, 0, 5, 5))
+    assert blokus.grid[5][5] is None
+    assert blokus.winners == [1, 2]
+
+
 def test_grid_x() -> None:
     """
     Test a grid
@@ -676,3 +815,232 @@ def simulate_moves(blokus: BlokusBase, pieces: list[Optional[Piece]]) -> None:
             blokus.retire()
         else:
             blokus.maybe_place(piece)
+
+
+def test_available_moves() -> None:
+    """
+    Test that available_moves finds exactly the placements
+    (of any shape, orientation, and anchor) that do not collide
+    """
+
+    blokus = init_blokus_mini(2)
+    piece = Piece(blokus.shapes[ShapeKind.X])
+    piece.set_anchor((2, 2))
+    assert blokus.maybe_place(piece)
+
+    expected = set()
+    for kind in blokus.remaining_shapes(blokus.curr_player):
+        for face_up in [True, False]:
+            for rotation in range(4):
+                for r in range(5):
+                    for c in range(5):
+                        piece = Piece(blokus.shapes[kind], face_up, rotation)
+                        piece.set_anchor((r, c))
+                        if not blokus.any_collisions(piece):
+                            expected.add((kind, frozenset(piece.squares())))
+
+    moves = blokus.available_moves()
+    actual = {(move.shape.kind, frozenset(move.squares())) for move in moves}
+    assert actual == expected
+    assert len(moves) == len(expected), "No two moves cover the same squares"
+    assert all(blokus.legal_to_place(move) for move in moves)
+
+
+def test_piece_equality() -> None:
+    """Test that pieces with the same squares and anchor are equal"""
+
+    blokus = init_blokus_mini(1)
+
+    # All orientations of ONE and X are the same
+    for kind in [ShapeKind.ONE, ShapeKind.X]:
+        pieces = set()
+        for face_up in [True, False]:
+            for rotation in range(4):
+                piece = Piece(blokus.shapes[kind], face_up, rotation)
+                piece.set_anchor((2, 2))
+                pieces.add(piece)
+        assert len(pieces) == 1
+
+    # But rotating Z by 90 degrees changes its squares
+    piece_z = Piece(blokus.shapes[ShapeKind.Z])
+    piece_z.set_anchor((2, 2))
+    piece_z_rotated = Piece(blokus.shapes[ShapeKind.Z], rotation=1)
+    piece_z_rotated.set_anchor((2, 2))
+    assert piece_z != piece_z_rotated
+
+    piece_z_rotated.rotate_left()
+    assert piece_z == piece_z_rotated
+    assert hash(piece_z) == hash(piece_z_rotated)
+
+    # Pieces at different anchors are not equal
+    piece_z_rotated.set_anchor((2, 1))
+    assert piece_z != piece_z_rotated
+
+    # Pieces built from a shape that was transformed in place are
+    # equal to those built by orienting the original shape
+    shape_z = Shape.from_string(
+        ShapeKind.Z, shape_definitions.definitions[ShapeKind.Z]
+    )
+    shape_z.flip_horizontally()
+    shape_z.rotate_right()
+    piece_transformed = Piece(shape_z)
+    piece_transformed.set_anchor((2, 2))
+    piece_oriented = Piece(blokus.shapes[ShapeKind.Z], False, 1)
+    piece_oriented.set_anchor((2, 2))
+    assert piece_transformed.squares() == piece_oriented.squares()
+    assert piece_transformed == piece_oriented
+    assert hash(piece_transformed) == hash(piece_oriented)
+    piece_transformed.rotate_left()
+    piece_oriented.rotate_left()
+    assert piece_transformed == piece_oriented
+
+
+def test_piece_neighbors() -> None:
+    """Test the cardinal and intercardinal neighbors of a piece"""
+
+    blokus = init_blokus_mini(1)
+
+    piece = Piece(blokus.shapes[ShapeKind.L])
+    with pytest.raises(ValueError):
+        piece.cardinal_neighbors()
+    with pytest.raises(ValueError):
+        piece.intercardinal_neighbors()
+
+    piece.set_anchor((3, 3))
+    assert piece.squares() == [(1, 3), (2, 3), (3, 3), (4, 3), (4, 4)]
+    assert piece.cardinal_neighbors() == {
+        (0, 3),
+        (1, 2),
+        (1, 4),
+        (2, 2),
+        (2, 4),
+        (3, 2),
+        (3, 4),
+        (4, 2),
+        (4, 5),
+        (5, 3),
+        (5, 4),
+    }
+    # (5, 4) is diagonal to (4, 3), but it is also a cardinal
+    # neighbor of (4, 4), so it is not an intercardinal neighbor
+    assert piece.intercardinal_neighbors() == {
+        (0, 2),
+        (0, 4),
+        (3, 5),
+        (5, 2),
+        (5, 5),
+    }
+
+
+def test_piece_neighbors_transformed() -> None:
+    """
+    Test the neighbors of a flipped and rotated piece, which are
+    computed from neighbor sets shared by all pieces with the
+    same oriented shape
+    """
+
+    blokus = init_blokus_mini(1)
+
+    piece = Piece(blokus.shapes[ShapeKind.Z], face_up=False, rotation=1)
+    piece.set_anchor((2, 2))
+    assert piece.squares() == [(1, 1), (2, 1), (2, 2), (2, 3), (3, 3)]
+
+    cardinal = {
+        (0, 1),
+        (1, 0),
+        (1, 2),
+        (1, 3),
+        (2, 0),
+        (2, 4),
+        (3, 1),
+        (3, 2),
+        (3, 4),
+        (4, 3),
+    }
+    intercardinal = {(0, 0), (0, 2), (1, 4), (3, 0), (4, 2), (4, 4)}
+    assert piece.cardinal_neighbors() == cardinal
+    assert piece.intercardinal_neighbors() == intercardinal
+
+    # Modifying the returned sets does not affect other pieces
+    piece.cardinal_neighbors().clear()
+    piece.intercardinal_neighbors().clear()
+    other = Piece(blokus.shapes[ShapeKind.Z], face_up=False, rotation=1)
+    other.set_anchor((2, 2))
+    assert other.cardinal_neighbors() == cardinal
+    assert other.intercardinal_neighbors() == intercardinal
+
+    # The neighbors follow the piece when it is turned face up again
+    piece.rotate_left()
+    piece.flip_horizontally()
+    assert piece.squares() == [(1, 1), (1, 2), (2, 2), (3, 2), (3, 3)]
+    assert piece.cardinal_neighbors() == {
+        (0, 1),
+        (0, 2),
+        (1, 0),
+        (1, 3),
+        (2, 1),
+        (2, 3),
+        (3, 1),
+        (3, 4),
+        (4, 2),
+        (4, 3),
+    }
+    assert piece.intercardinal_neighbors() == {
+        (0, 0),
+        (0, 3),
+        (2, 0),
+        (2, 4),
+        (4, 1),
+        (4, 4),
+    }
+
+
+def test_piece_occupancy() -> None:
+    """Test the bitboard of a piece's squares"""
+
+    blokus = init_blokus_mini(1)
+
+    piece = Piece(blokus.shapes[ShapeKind.Z], face_up=False, rotation=1)
+    for anchor in [(1, 1), (2, 3)]:
+        piece.set_anchor(anchor)
+        for _ in range(2):
+            for size in [5, 7, 5]:
+                expected = sum(1 << (r * size + c) for r, c in piece.squares())
+                assert piece.occupancy(size) == expected
+                assert piece.shape.occupancy_at(*anchor, size) == expected
+            assert piece.shape.coords_at(*anchor) == piece.abs_coords()
+            piece.rotate_right()
+
+
+def test_play_moves() -> None:
+    """
+    Test that playing packed moves has the same effect as
+    placing the corresponding pieces
+    """
+
+    blokus = BlokusFake(2, 14, {(4, 4), (9, 9)})
+    blokus_pieces = BlokusFake(2, 14, {(4, 4), (9, 9)})
+
+    # Each player plays their first available move, until
+    # Player 2 retires on their seventh turn
+    moves: list[Optional[Move]] = []
+    for i in range(20):
+        if i == 13:
+            moves.append(None)
+            blokus_pieces.retire()
+            continue
+        move = min(blokus_pieces.available_moves_packed())
+        moves.append(move)
+        piece = blokus_pieces.move_to_piece(move)
+        assert blokus_pieces.maybe_place(piece)
+
+    blokus.play_moves(moves)
+
+    assert blokus.grid == blokus_pieces.grid
+    assert blokus.curr_player == blokus_pieces.curr_player == 1
+    assert blokus.retired_players == {2}
+    for player in [1, 2]:
+        assert blokus.get_score(player) == blokus_pieces.get_score(player)
+        assert blokus.remaining_shapes(player) == (
+            blokus_pieces.remaining_shapes(player)
+        )